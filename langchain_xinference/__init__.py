@@ -1,5 +1,6 @@
 from importlib import metadata
 
+from langchain_xinference._utils import aclose_async_sessions
 from langchain_xinference.chat_models import ChatXinference
 from langchain_xinference.embeddings import XinferenceEmbeddings
 from langchain_xinference.llms import Xinference
@@ -18,4 +19,5 @@ __all__ = [
     "XinferenceEmbeddings",
     "XinferenceRerank",
     "__version__",
+    "aclose_async_sessions",
 ]
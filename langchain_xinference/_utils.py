@@ -0,0 +1,302 @@
+"""Helpers shared by the Xinference integrations."""
+
+import asyncio
+import functools
+import json
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Union
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+REQUEST_TIMEOUT = (3, 10)
+"""Connect and read timeouts, in seconds, for short REST calls made outside the xinference client"""
+INFERENCE_TIMEOUT = (3, None)
+"""Connect timeout for direct inference calls, whose duration depends on the model"""
+
+
+def _create_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+SESSION = _create_session()
+"""Process-wide keep-alive session reused for every REST call to the xinference server"""
+
+_ASYNC_SESSIONS: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+_CLIENTS: Dict[Tuple[str, Optional[str]], Any] = {}
+_ASYNC_CLIENTS: Dict[asyncio.AbstractEventLoop, Dict[Tuple[str, Optional[str]], Any]] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def _release_session(session: Optional[aiohttp.ClientSession]) -> None:
+    """Drop an aiohttp session whose event loop is closed and can no longer await its close."""
+    if session is None:
+        return
+    closing = session.close()
+    try:
+        # with the loop closed the connector has no transports left to wait for, so closing
+        # finishes without ever suspending
+        closing.send(None)
+    except StopIteration:
+        return
+    closing.close()
+    session.detach()
+
+
+def _release_session_owner(owner: Any) -> None:
+    """Release the session of a client or model handle whose event loop is closed."""
+    _release_session(owner.session)
+    owner.session = None
+
+
+def _prune_closed_loops() -> None:
+    """Release the sessions and clients cached for event loops that have been closed.
+
+    Must be called with `_CLIENTS_LOCK` held.
+    """
+    for loop in [loop for loop in _ASYNC_SESSIONS if loop.is_closed()]:
+        _release_session(_ASYNC_SESSIONS.pop(loop))
+    for loop in [loop for loop in _ASYNC_CLIENTS if loop.is_closed()]:
+        for client in _ASYNC_CLIENTS.pop(loop).values():
+            _release_session_owner(client)
+
+
+def get_async_session() -> aiohttp.ClientSession:
+    """Return the aiohttp session shared by direct REST calls on the running event loop.
+
+    aiohttp sessions cannot move between event loops, so one pooled session is kept per
+    loop. Sessions of loops that have been closed are released on the next call.
+    """
+    loop = asyncio.get_running_loop()
+    with _CLIENTS_LOCK:
+        _prune_closed_loops()
+        session = _ASYNC_SESSIONS.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit=128, limit_per_host=64)
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=INFERENCE_TIMEOUT[0])
+            session = _ASYNC_SESSIONS[loop] = aiohttp.ClientSession(connector=connector, timeout=timeout)
+    return session
+
+
+async def aclose_async_sessions() -> None:
+    """Close the aiohttp sessions shared on the running event loop and release those of closed loops.
+
+    This covers the pooled session of the direct REST calls and the async RESTful clients, which
+    every Xinference model of the process shares. Call it once the application is done with
+    them, e.g. before its event loop shuts down; they are rebuilt on their next use.
+    """
+    loop = asyncio.get_running_loop()
+    with _CLIENTS_LOCK:
+        session = _ASYNC_SESSIONS.pop(loop, None)
+        clients = list(_ASYNC_CLIENTS.pop(loop, {}).values())
+        _prune_closed_loops()
+    if session is not None:
+        await session.close()
+    for client in clients:
+        await client.close()
+
+
+class AsyncModelHandles:
+    """Async model handles of one model, cached per event loop.
+
+    Each handle owns an aiohttp session bound to the loop that resolved it, so a handle is
+    only reused on that loop and released once the loop is closed.
+    """
+
+    def __init__(self) -> None:
+        self._handles: Dict[asyncio.AbstractEventLoop, Any] = {}
+        self._locks: Dict[asyncio.AbstractEventLoop, asyncio.Lock] = {}
+
+    async def get(self, resolve: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the handle of the running loop, calling `resolve` once to create it."""
+        loop = asyncio.get_running_loop()
+        handle = self._handles.get(loop)
+        if handle is None:
+            self._prune()
+            async with self._locks.setdefault(loop, asyncio.Lock()):
+                handle = self._handles.get(loop)
+                if handle is None:
+                    handle = self._handles[loop] = await resolve()
+        return handle
+
+    def discard(self) -> None:
+        """Forget the handle of the running loop, so the next call resolves it again."""
+        self._handles.pop(asyncio.get_running_loop(), None)
+
+    async def aclose(self) -> None:
+        """Close the handle of the running loop and release those of closed loops."""
+        handle = self._handles.pop(asyncio.get_running_loop(), None)
+        self._prune()
+        if handle is not None:
+            await handle.close()
+
+    def _prune(self) -> None:
+        for loop in [loop for loop in self._handles if loop.is_closed()]:
+            _release_session_owner(self._handles.pop(loop))
+        for loop in [loop for loop in self._locks if loop.is_closed()]:
+            del self._locks[loop]
+
+
+def _import_clients() -> Tuple[Any, Any]:
+    try:
+        from xinference.client import AsyncRESTfulClient, RESTfulClient
+    except ImportError:
+        try:
+            from xinference_client import AsyncRESTfulClient, RESTfulClient
+        except ImportError as e:
+            raise ImportError(
+                "Could not import RESTfulClient from xinference. Please install it"
+                " with `pip install xinference` or `pip install xinference_client`."
+            ) from e
+    return RESTfulClient, AsyncRESTfulClient
+
+
+@functools.lru_cache(maxsize=None)
+def client_classes() -> Tuple[Any, Any]:
+    """Return the RESTful client classes, adapted to share one cluster auth probe per server URL.
+
+    The stock clients probe `/v1/cluster/auth` with a blocking request in `__init__`. The sync
+    client here reuses the cached probe of `cluster_auth_enabled`, and the async client takes
+    the already known answer, so building it on the event loop does no I/O at all.
+    """
+    RESTfulClient, AsyncRESTfulClient = _import_clients()
+
+    class Client(RESTfulClient):  # type: ignore[misc, valid-type]
+        def _check_cluster_authenticated(self) -> None:
+            self._cluster_authed = cluster_auth_enabled(SESSION, self.base_url)
+
+    class AsyncClient(AsyncRESTfulClient):  # type: ignore[misc, valid-type]
+        def __init__(self, base_url: str, api_key: Optional[str], cluster_authed: bool):
+            self._known_cluster_authed = cluster_authed
+            super().__init__(base_url, api_key)
+
+        def _check_cluster_authenticated(self) -> None:
+            self._cluster_authed = self._known_cluster_authed
+
+    return Client, AsyncClient
+
+
+def get_client(server_url: str, api_key: Optional[str] = None) -> Any:
+    """Return the RESTful client for `server_url`, shared by every model in the process."""
+    key = (server_url, api_key)
+    client = _CLIENTS.get(key)
+    if client is None:
+        Client, _ = client_classes()
+        # built outside the lock, the auth probe may take a while on a slow server
+        client = Client(server_url, api_key)
+        with _CLIENTS_LOCK:
+            client = _CLIENTS.setdefault(key, client)
+    return client
+
+
+async def aget_async_client(server_url: str, api_key: Optional[str] = None) -> Any:
+    """Return the async RESTful client for `server_url` on the running event loop.
+
+    The client holds an aiohttp session bound to the loop, so it is cached per loop and
+    released once that loop is closed.
+    """
+    loop = asyncio.get_running_loop()
+    key = (server_url, api_key)
+    with _CLIENTS_LOCK:
+        _prune_closed_loops()
+        client = _ASYNC_CLIENTS.get(loop, {}).get(key)
+    if client is None:
+        cluster_authed = await acluster_auth_enabled(server_url)
+        _, AsyncClient = client_classes()
+        client = AsyncClient(server_url, api_key, cluster_authed)
+        with _CLIENTS_LOCK:
+            loop_clients = _ASYNC_CLIENTS.setdefault(loop, {})
+            existing = loop_clients.setdefault(key, client)
+        if existing is not client:
+            await client.close()
+            client = existing
+    return client
+
+
+def json_loads(data: Union[bytes, str]) -> Any:
+    """Parse a JSON document, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(obj: Any) -> bytes:
+    """Serialize `obj` to JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
+
+
+def error_detail(content: bytes, status: int, reason: Optional[str]) -> str:
+    """Return the `detail` of an error response from the server, falling back to its HTTP status."""
+    try:
+        return str(json_loads(content)["detail"])
+    except (ValueError, KeyError, TypeError):
+        return f"{status} {reason}"
+
+
+def import_numpy() -> Any:
+    """Import numpy, which is only needed by the ndarray helpers."""
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError("Could not import numpy. Please install it with `pip install numpy`.") from e
+    return numpy
+
+
+_CLUSTER_AUTH: Dict[Optional[str], bool] = {}
+
+
+def _auth_url(server_url: Optional[str]) -> str:
+    return f"{server_url}/v1/cluster/auth"
+
+
+def cluster_auth_enabled(session: requests.Session, server_url: Optional[str]) -> bool:
+    """Return whether the xinference cluster at `server_url` requires authentication.
+
+    The server is probed once per process, later calls return the cached answer.
+    """
+    cluster_authed = _CLUSTER_AUTH.get(server_url)
+    if cluster_authed is None:
+        cluster_authed = _CLUSTER_AUTH[server_url] = _probe_cluster_auth(session, server_url)
+    return cluster_authed
+
+
+async def acluster_auth_enabled(server_url: Optional[str]) -> bool:
+    """Async version of `cluster_auth_enabled` which does not block the event loop."""
+    cluster_authed = _CLUSTER_AUTH.get(server_url)
+    if cluster_authed is None:
+        cluster_authed = _CLUSTER_AUTH[server_url] = await _aprobe_cluster_auth(server_url)
+    return cluster_authed
+
+
+def _probe_cluster_auth(session: requests.Session, server_url: Optional[str]) -> bool:
+    response = session.get(_auth_url(server_url), timeout=REQUEST_TIMEOUT)
+    if response.status_code == 404:
+        return False
+    if response.status_code != 200:
+        raise RuntimeError(f"Failed to get cluster information, detail: {json_loads(response.content)['detail']}")
+    return bool(json_loads(response.content)["auth"])
+
+
+async def _aprobe_cluster_auth(server_url: Optional[str]) -> bool:
+    connect, read = REQUEST_TIMEOUT
+    timeout = aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        async with session.get(_auth_url(server_url)) as response:
+            if response.status == 404:
+                return False
+            response_data = json_loads(await response.read())
+            if response.status != 200:
+                raise RuntimeError(f"Failed to get cluster information, detail: {response_data['detail']}")
+            return bool(response_data["auth"])
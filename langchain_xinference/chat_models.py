@@ -12,8 +12,7 @@ from typing import (
     Union,
 )
 
-import requests
-from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
 from langchain_core.language_models import LanguageModelInput
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.messages import (
@@ -27,6 +26,8 @@ from langchain_core.runnables import Runnable
 from langchain_core.tools import BaseTool
 from langchain_core.utils.function_calling import convert_to_openai_tool
 
+from langchain_xinference._utils import aget_async_client, client_classes, get_client
+
 if TYPE_CHECKING:
     from xinference.client.handlers import AsyncChatModelHandle, ChatModelHandle
     from xinference.model.llm.core import LlamaCppGenerateConfig
@@ -141,17 +142,6 @@ class ChatXinference(BaseChatModel):
         api_key: Optional[str] = None,
         **model_kwargs: Any,
     ):
-        try:
-            from xinference.client import AsyncRESTfulClient, RESTfulClient
-        except ImportError:
-            try:
-                from xinference_client import AsyncRESTfulClient, RESTfulClient
-            except ImportError as e:
-                raise ImportError(
-                    "Could not import RESTfulClient from xinference. Please install it"
-                    " with `pip install xinference` or `pip install xinference_client`."
-                ) from e
-
         model_kwargs = model_kwargs or {}
 
         super().__init__(
@@ -168,17 +158,9 @@ class ChatXinference(BaseChatModel):
         if self.model_uid is None:
             raise ValueError("Please provide the model UID")
 
-        self._headers: Dict[str, str] = {}
-        self._cluster_authed = False
-        self._check_cluster_authenticated()
-        if api_key is not None and self._cluster_authed:
-            self._headers["Authorization"] = f"Bearer {api_key}"
-
-        self.client = RESTfulClient(server_url, api_key)
-        try:
-            self.async_client = AsyncRESTfulClient(server_url, api_key)
-        except RuntimeError:
-            self.async_client = None
+        # fail early when neither xinference nor xinference_client is installed
+        client_classes()
+        self._api_key = api_key
 
     @property
     def _llm_type(self) -> str:
@@ -194,17 +176,17 @@ class ChatXinference(BaseChatModel):
             **{"model_kwargs": self.model_kwargs},
         }
 
-    def _check_cluster_authenticated(self) -> None:
-        url = f"{self.server_url}/v1/cluster/auth"
-        response = requests.get(url)
-        if response.status_code == 404:
-            self._cluster_authed = False
-        else:
-            if response.status_code != 200:
-                raise RuntimeError(f"Failed to get cluster information, detail: {response.json()['detail']}")
-            response_data = response.json()
+    def _get_client(self) -> Any:
+        """Return the RESTful client, building it on first use."""
+        if self.client is None:
+            self.client = get_client(self.server_url, self._api_key)
+        return self.client
 
-            self._cluster_authed = bool(response_data["auth"])
+    async def _aget_async_client(self) -> Any:
+        """Return the async RESTful client of the running event loop, building it on first use."""
+        if self.async_client is not None:
+            return self.async_client
+        return await aget_async_client(self.server_url, self._api_key)
 
     def _generate(
         self,
@@ -213,10 +195,7 @@ class ChatXinference(BaseChatModel):
         run_manager: Optional[CallbackManagerForLLMRun] = None,
         **kwargs: Any,
     ) -> ChatResult:
-        if self.client is None:
-            raise ValueError("Client is not initialized!")
-
-        model = self.client.get_model(self.model_uid)
+        model = self._get_client().get_model(self.model_uid)
         generate_config: "LlamaCppGenerateConfig" = kwargs.get("generate_config", {})
         generate_config = {**self.model_kwargs, **generate_config}
 
@@ -248,13 +227,11 @@ class ChatXinference(BaseChatModel):
         self,
         messages: List[BaseMessage],
         stop: Optional[List[str]] = None,
-        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
         **kwargs: Any,
     ) -> ChatResult:
-        if self.async_client is None:
-            raise ValueError("Client is not initialized!")
-
-        model = await self.async_client.get_model(self.model_uid)
+        async_client = await self._aget_async_client()
+        model = await async_client.get_model(self.model_uid)
         generate_config: "LlamaCppGenerateConfig" = kwargs.get("generate_config", {})
         generate_config = {**self.model_kwargs, **generate_config}
 
@@ -329,7 +306,7 @@ class ChatXinference(BaseChatModel):
         self,
         model: Union["AsyncChatModelHandle"],
         messages: List[BaseMessage],
-        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
         verbose: bool = False,
         generate_config: Optional["LlamaCppGenerateConfig"] = None,
     ) -> ChatGenerationChunk:
@@ -343,7 +320,7 @@ class ChatXinference(BaseChatModel):
             response = response
             chunk = self._chat_response_to_chat_generation_chunk(response["choices"][0])
             if run_manager:
-                run_manager.on_llm_new_token(
+                await run_manager.on_llm_new_token(
                     chunk.text,
                     chunk=chunk,
                     verbose=verbose,
@@ -359,7 +336,7 @@ class ChatXinference(BaseChatModel):
                 else:
                     final_chunk += chunk
                 if run_manager:
-                    run_manager.on_llm_new_token(
+                    await run_manager.on_llm_new_token(
                         chunk.text,
                         chunk=chunk,
                         verbose=verbose,
@@ -412,10 +389,7 @@ class ChatXinference(BaseChatModel):
         run_manager: Optional[CallbackManagerForLLMRun] = None,
         **kwargs: Any,
     ) -> Iterator[ChatGenerationChunk]:
-        if self.client is None:
-            raise ValueError("Client is not initialized!")
-
-        model = self.client.get_model(self.model_uid)
+        model = self._get_client().get_model(self.model_uid)
 
         generate_config = kwargs.get("generate_config", {})
         if "stream" not in generate_config or not generate_config.get("stream", False):
@@ -431,27 +405,24 @@ class ChatXinference(BaseChatModel):
             generate_config=generate_config,
         )
 
+        on_llm_new_token = run_manager.on_llm_new_token if run_manager else None
+        verbose = self.verbose
         for stream_resp in response:
             if stream_resp:
                 chunk = self._chat_response_to_chat_generation_chunk(stream_resp["choices"][0])
-                if run_manager:
-                    run_manager.on_llm_new_token(
-                        chunk.text,
-                        verbose=self.verbose,
-                    )
+                if on_llm_new_token is not None:
+                    on_llm_new_token(chunk.text, verbose=verbose)
                 yield chunk
 
     async def _astream(
         self,
         messages: List[BaseMessage],
         stop: Optional[List[str]] = None,
-        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
         **kwargs: Any,
     ) -> AsyncIterator[ChatGenerationChunk]:
-        if self.client is None:
-            raise ValueError("Client is not initialized!")
-
-        model = await self.async_client.get_model(self.model_uid)
+        async_client = await self._aget_async_client()
+        model = await async_client.get_model(self.model_uid)
 
         generate_config = kwargs.get("generate_config", {})
         if "stream" not in generate_config or not generate_config.get("stream", False):
@@ -467,14 +438,13 @@ class ChatXinference(BaseChatModel):
             generate_config=generate_config,
         )
 
+        on_llm_new_token = run_manager.on_llm_new_token if run_manager else None
+        verbose = self.verbose
         async for stream_resp in response:
             if stream_resp:
                 chunk = self._chat_response_to_chat_generation_chunk(stream_resp["choices"][0])
-                if run_manager:
-                    run_manager.on_llm_new_token(
-                        chunk.text,
-                        verbose=self.verbose,
-                    )
+                if on_llm_new_token is not None:
+                    await on_llm_new_token(chunk.text, verbose=verbose)
                 yield chunk
 
     def _choice_tools(self, tool_choice: Optional[Union[str]] = None):
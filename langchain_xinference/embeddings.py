@@ -1,10 +1,174 @@
 """Wrapper around Xinference embedding models."""
 
-from typing import Any, Dict, List, Optional
+import asyncio
+import hashlib
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, ClassVar, Dict, List, Optional, Tuple
 
 import requests
 from langchain_core.embeddings import Embeddings
 
+from langchain_xinference._utils import (
+    INFERENCE_TIMEOUT,
+    SESSION,
+    AsyncModelHandles,
+    aget_async_client,
+    client_classes,
+    error_detail,
+    get_async_session,
+    get_client,
+    import_numpy,
+    json_dumps,
+    json_loads,
+)
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+class _EmbeddingCache:
+    """Thread-safe LRU cache of embeddings with an optional time-to-live."""
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Tuple[Optional[str], bytes], Tuple[float, array]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(model_uid: Optional[str], text: str) -> Tuple[Optional[str], bytes]:
+        return model_uid, hashlib.sha256(text.encode("utf-8")).digest()
+
+    def get(self, model_uid: Optional[str], text: str) -> Optional[List[float]]:
+        key = self._key(model_uid, text)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            stored_at, embedding = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+        return embedding.tolist()
+
+    def set(self, model_uid: Optional[str], text: str, embedding: List[float]) -> None:
+        key = self._key(model_uid, text)
+        with self._lock:
+            self._data[key] = (time.monotonic(), array("d", embedding))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class _QueryBatcher:
+    """Coalesces concurrent `aembed_query` calls into batched embedding requests.
+
+    The worker collecting batches only runs while queries are queued, and up to
+    `max_concurrency` batches are embedded at the same time.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[List[str]], Awaitable[List[List[float]]]],
+        max_batch_size: int,
+        max_wait: float,
+        max_concurrency: int,
+    ):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_concurrency = max_concurrency
+        self._embed = embed
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: "asyncio.Queue[Tuple[str, asyncio.Future]]" = asyncio.Queue()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._worker: "Optional[asyncio.Task[None]]" = None
+        self._batches: "Dict[asyncio.Task[None], List[Tuple[str, asyncio.Future]]]" = {}
+
+    async def submit(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._worker = None
+            self._batches = {}
+        future = loop.create_future()
+        self._queue.put_nowait((text, future))
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run())
+        return await future
+
+    async def aclose(self) -> None:
+        """Cancel the worker and the batches in flight, failing the queries still waiting."""
+        batches = dict(self._batches)
+        tasks = [task for task in (self._worker, *batches) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # a batch cancelled before it started never got the chance to cancel its own futures
+        for items in batches.values():
+            for _, future in items:
+                future.cancel()
+        while not self._queue.empty():
+            self._queue.get_nowait()[1].cancel()
+        self._loop = None
+
+    async def _run(self) -> None:
+        queue, semaphore = self._queue, self._semaphore
+        while not queue.empty():
+            items = [queue.get_nowait()]
+            try:
+                # Give concurrent callers a short window to join this batch.
+                await asyncio.sleep(self.max_wait)
+                while len(items) < self.max_batch_size and not queue.empty():
+                    items.append(queue.get_nowait())
+                await semaphore.acquire()
+            except asyncio.CancelledError:
+                for _, future in items:
+                    future.cancel()
+                raise
+            batch = asyncio.get_running_loop().create_task(self._embed_batch(items, semaphore))
+            self._batches[batch] = items
+            batch.add_done_callback(self._discard_batch)
+
+    def _discard_batch(self, batch: "asyncio.Task[None]") -> None:
+        self._batches.pop(batch, None)
+
+    async def _embed_batch(self, items: List[Tuple[str, asyncio.Future]], semaphore: asyncio.Semaphore) -> None:
+        try:
+            embeddings = await self._embed([text for text, _ in items])
+        except asyncio.CancelledError:
+            for _, future in items:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future), embedding in zip(items, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+        finally:
+            semaphore.release()
+
+
+_LIST_INPUT_REJECTED = ("str type expected", "should be a valid string")
+"""Validation errors of servers whose embedding endpoint only accepts a single string"""
+
+
+def _rejects_list_input(error: RuntimeError) -> bool:
+    detail = str(error).lower()
+    return any(marker in detail for marker in _LIST_INPUT_REJECTED)
+
+
+_FAST_PATH_UNSUPPORTED = (404, 405)
+"""Statuses of servers without a usable `/v1/embeddings` endpoint, which fall back to the client"""
+
 
 class XinferenceEmbeddings(Embeddings):
     """Xinference embedding models.
@@ -74,30 +238,38 @@ class XinferenceEmbeddings(Embeddings):
 
     """  # noqa: E501
 
-    client: Any
-    async_client: Any
+    client: Any = None
+    async_client: Any = None
+    _session: ClassVar[requests.Session] = SESSION
     server_url: Optional[str]
     """URL of the xinference server"""
     model_uid: Optional[str]
     """UID of the launched model"""
+    max_batch_size: int
+    """Maximum number of texts sent to the server in a single request"""
+    max_concurrency: int
+    """Maximum number of batches embedded concurrently by `aembed_documents`"""
+    cache_size: int
+    """Maximum number of embeddings kept in the in-memory cache, 0 (the default) disables caching"""
+    cache_ttl: Optional[float]
+    """Seconds a cached embedding stays valid, None keeps it until evicted; set it if the model UID may be relaunched"""
+    query_batch_wait_ms: Optional[float]
+    """Milliseconds `aembed_query` waits to batch concurrent queries into one request, None disables batching"""
+    fast_path: bool
+    """Post embedding requests straight to the REST API instead of going through the xinference client"""
 
     def __init__(
         self,
         server_url: Optional[str] = None,
         model_uid: Optional[str] = None,
         api_key: Optional[str] = None,
+        max_batch_size: int = 64,
+        max_concurrency: int = 8,
+        cache_size: int = 0,
+        cache_ttl: Optional[float] = None,
+        query_batch_wait_ms: Optional[float] = None,
+        fast_path: bool = False,
     ):
-        try:
-            from xinference.client import AsyncRESTfulClient, RESTfulClient
-        except ImportError:
-            try:
-                from xinference_client import AsyncRESTfulClient, RESTfulClient
-            except ImportError as e:
-                raise ImportError(
-                    "Could not import RESTfulClient from xinference. Please install it"
-                    " with `pip install xinference` or `pip install xinference_client`."
-                ) from e
-
         super().__init__()
 
         if server_url is None:
@@ -110,29 +282,203 @@ class XinferenceEmbeddings(Embeddings):
 
         self.model_uid = model_uid
 
-        self._headers: Dict[str, str] = {}
-        self._cluster_authed = False
-        self._check_cluster_authenticated()
-        if api_key is not None and self._cluster_authed:
-            self._headers["Authorization"] = f"Bearer {api_key}"
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be a positive integer")
+
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be a positive integer")
+
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+
+        if cache_size < 0:
+            raise ValueError("cache_size must not be negative")
+
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._cache = _EmbeddingCache(cache_size, cache_ttl) if cache_size else None
+
+        # fail early when neither xinference nor xinference_client is installed
+        client_classes()
+        self._api_key = api_key
+
+        self.fast_path = fast_path
+        self._embed_url = f"{server_url}/v1/embeddings"
+        self._embed_headers = {"Content-Type": "application/json"}
+        if api_key is not None:
+            self._embed_headers["Authorization"] = f"Bearer {api_key}"
 
-        self.client = RESTfulClient(server_url, api_key)
+        self._model: Any = None
+        self._amodels = AsyncModelHandles()
+
+        if query_batch_wait_ms is not None and query_batch_wait_ms < 0:
+            raise ValueError("query_batch_wait_ms must not be negative")
+
+        self.query_batch_wait_ms = query_batch_wait_ms
+        self._query_batcher = (
+            _QueryBatcher(self._aembed_texts, max_batch_size, query_batch_wait_ms / 1000, max_concurrency)
+            if query_batch_wait_ms is not None
+            else None
+        )
+
+    def _get_client(self) -> Any:
+        """Return the RESTful client, building it on first use."""
+        if self.client is None:
+            self.client = get_client(self.server_url, self._api_key)
+        return self.client
+
+    async def _aget_async_client(self) -> Any:
+        """Return the async RESTful client of the running event loop, building it on first use."""
+        if self.async_client is not None:
+            return self.async_client
+        return await aget_async_client(self.server_url, self._api_key)
+
+    def _get_model(self) -> Any:
+        """Return the model handle, resolving it on the server only once."""
+        if self._model is None:
+            self._model = self._get_client().get_model(self.model_uid)
+        return self._model
+
+    async def _aget_model(self) -> Any:
+        """Return the async model handle of the running event loop, resolving it on the server only once."""
+        return await self._amodels.get(self._aresolve_model)
+
+    async def _aresolve_model(self) -> Any:
+        async_client = await self._aget_async_client()
+        return await async_client.get_model(self.model_uid)
+
+    @staticmethod
+    def _parse_embeddings(response: Dict[str, Any]) -> List[List[float]]:
+        """Return the embeddings of a batched response in input order."""
+        data = sorted(response["data"], key=lambda item: item["index"])
+        return [list(map(float, item["embedding"])) for item in data]
+
+    def _batches(self, texts: List[str]) -> List[List[str]]:
+        size = self.max_batch_size
+        return [texts[i : i + size] for i in range(0, len(texts), size)]
+
+    @staticmethod
+    def _fill_array(
+        np: Any, out: Optional["np.ndarray"], rows: int, offset: int, response: Dict[str, Any]
+    ) -> "np.ndarray":
+        """Copy the embeddings of a batched response into `out` from row `offset`, allocating it on first use."""
+        data = response["data"]
+        if out is None:
+            out = np.empty((rows, len(data[0]["embedding"])), dtype=np.float32)
+        for item in data:
+            out[offset + item["index"]] = item["embedding"]
+        return out
+
+    @staticmethod
+    def _indexed_response(responses: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Join the responses of single text requests into one batched response."""
+        return {"data": [{"index": i, "embedding": r["data"][0]["embedding"]} for i, r in enumerate(responses)]}
+
+    def _embed_direct(self, texts: List[str]) -> Optional[Dict[str, Any]]:
+        """Embed `texts` with a direct REST call, returning None if the server has no such endpoint."""
+        response = self._session.post(
+            self._embed_url,
+            data=json_dumps({"model": self.model_uid, "input": texts}),
+            headers=self._embed_headers,
+            timeout=INFERENCE_TIMEOUT,
+        )
+        if response.status_code in _FAST_PATH_UNSUPPORTED:
+            return None
+        if not response.ok:
+            detail = error_detail(response.content, response.status_code, response.reason)
+            raise RuntimeError(f"Failed to create the embeddings, detail: {detail}")
+        return json_loads(response.content)
+
+    def _request_embeddings(self, texts: List[str]) -> Dict[str, Any]:
+        """Return the batched embeddings response of `texts`, as sent by the server."""
+        if self.fast_path:
+            response = self._embed_direct(texts)
+            if response is not None:
+                return response
+
+        # resolved only here, the direct path never needs the client or the model handle
+        model = self._get_model()
+        try:
+            return model.create_embedding(texts)
+        except RuntimeError as e:
+            if not _rejects_list_input(e):
+                raise
+            # Servers which reject list input are embedded one text at a time.
+            return self._indexed_response([model.create_embedding(text) for text in texts])
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return self._parse_embeddings(self._request_embeddings(texts))
+
+    async def _aembed_direct(self, texts: List[str]) -> Optional[Dict[str, Any]]:
+        """Async version of `_embed_direct`, sharing one pooled aiohttp session per event loop."""
+        async with get_async_session().post(
+            self._embed_url,
+            data=json_dumps({"model": self.model_uid, "input": texts}),
+            headers=self._embed_headers,
+        ) as response:
+            if response.status in _FAST_PATH_UNSUPPORTED:
+                return None
+            content = await response.read()
+            if not response.ok:
+                detail = error_detail(content, response.status, response.reason)
+                raise RuntimeError(f"Failed to create the embeddings, detail: {detail}")
+            return json_loads(content)
+
+    async def _arequest_embeddings(self, texts: List[str]) -> Dict[str, Any]:
+        """Async version of `_request_embeddings`."""
+        if self.fast_path:
+            response = await self._aembed_direct(texts)
+            if response is not None:
+                return response
+
+        model = await self._aget_model()
         try:
-            self.async_client = AsyncRESTfulClient(server_url, api_key)
+            return await model.create_embedding(texts)
+        except RuntimeError as e:
+            if not _rejects_list_input(e):
+                raise
+            # Servers which reject list input are embedded one text at a time.
+            return self._indexed_response([await model.create_embedding(text) for text in texts])
+
+    async def _aembed_batch(self, texts: List[str]) -> List[List[float]]:
+        return self._parse_embeddings(await self._arequest_embeddings(texts))
+
+    async def _aembed_texts(self, texts: List[str]) -> List[List[float]]:
+        try:
+            return await self._aembed_batch(texts)
         except RuntimeError:
-            self.async_client = None
+            self._amodels.discard()
+            raise
 
-    def _check_cluster_authenticated(self) -> None:
-        url = f"{self.server_url}/v1/cluster/auth"
-        response = requests.get(url)
-        if response.status_code == 404:
-            self._cluster_authed = False
-        else:
-            if response.status_code != 200:
-                raise RuntimeError(f"Failed to get cluster information, detail: {response.json()['detail']}")
-            response_data = response.json()
+    def _cache_get(self, text: str) -> Optional[List[float]]:
+        if self._cache is None:
+            return None
+        return self._cache.get(self.model_uid, text)
+
+    def _cache_set(self, text: str, embedding: List[float]) -> None:
+        if self._cache is not None:
+            self._cache.set(self.model_uid, text, embedding)
 
-            self._cluster_authed = bool(response_data["auth"])
+    def _merge_cached(
+        self,
+        cached: List[Optional[List[float]]],
+        missing: List[str],
+        embeddings: List[List[float]],
+    ) -> List[List[float]]:
+        """Cache freshly computed embeddings and splice them back in input order."""
+        fresh = iter(embeddings)
+        for text, embedding in zip(missing, embeddings):
+            self._cache_set(text, embedding)
+        return [embedding if embedding is not None else next(fresh) for embedding in cached]
+
+    async def aclose(self) -> None:
+        """Stop the query batcher and close the async model handles of this instance.
+
+        The sessions shared with other models are left open, see `aclose_async_sessions`.
+        """
+        if self._query_batcher is not None:
+            await self._query_batcher.aclose()
+        await self._amodels.aclose()
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """Embed a list of documents using Xinference.
@@ -142,10 +488,17 @@ class XinferenceEmbeddings(Embeddings):
             List of embeddings, one for each text.
         """
 
-        model = self.client.get_model(self.model_uid)
+        cached = [self._cache_get(text) for text in texts]
+        missing = [text for text, embedding in zip(texts, cached) if embedding is None]
+        if not missing:
+            return cached  # type: ignore[return-value]
 
-        embeddings = [model.create_embedding(text)["data"][0]["embedding"] for text in texts]
-        return [list(map(float, e)) for e in embeddings]
+        try:
+            embeddings = [e for batch in self._batches(missing) for e in self._embed_batch(batch)]
+        except RuntimeError:
+            self._model = None
+            raise
+        return self._merge_cached(cached, missing, embeddings)
 
     async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
         """Embed a list of documents using Xinference.
@@ -155,10 +508,74 @@ class XinferenceEmbeddings(Embeddings):
             List of embeddings, one for each text.
         """
 
-        model = await self.async_client.get_model(self.model_uid)
+        cached = [self._cache_get(text) for text in texts]
+        missing = [text for text, embedding in zip(texts, cached) if embedding is None]
+        if not missing:
+            return cached  # type: ignore[return-value]
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
 
-        embeddings = [(await model.create_embedding(text))["data"][0]["embedding"] for text in texts]
-        return [list(map(float, e)) for e in embeddings]
+        async def run(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await self._aembed_batch(batch)
+
+        try:
+            results = await asyncio.gather(*(run(batch) for batch in self._batches(missing)))
+        except RuntimeError:
+            self._amodels.discard()
+            raise
+        embeddings = [e for batch in results for e in batch]
+        return self._merge_cached(cached, missing, embeddings)
+
+    def embed_documents_np(self, texts: List[str]) -> "np.ndarray":
+        """Embed a list of documents using Xinference.
+        Args:
+            texts: The list of texts to embed.
+        Returns:
+            A float32 array of shape (len(texts), dimensions).
+
+        The embeddings are copied from the responses straight into the array, without
+        going through Python float lists or the embedding cache.
+        """
+
+        np = import_numpy()
+        out = None
+        try:
+            for offset in range(0, len(texts), self.max_batch_size):
+                response = self._request_embeddings(texts[offset : offset + self.max_batch_size])
+                out = self._fill_array(np, out, len(texts), offset, response)
+        except RuntimeError:
+            self._model = None
+            raise
+        return out if out is not None else np.empty((0, 0), dtype=np.float32)
+
+    async def aembed_documents_np(self, texts: List[str]) -> "np.ndarray":
+        """Embed a list of documents using Xinference.
+        Args:
+            texts: The list of texts to embed.
+        Returns:
+            A float32 array of shape (len(texts), dimensions).
+
+        The embeddings are copied from the responses straight into the array, without
+        going through Python float lists or the embedding cache.
+        """
+
+        np = import_numpy()
+        out = None
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(offset: int) -> None:
+            nonlocal out
+            async with semaphore:
+                response = await self._arequest_embeddings(texts[offset : offset + self.max_batch_size])
+            out = self._fill_array(np, out, len(texts), offset, response)
+
+        try:
+            await asyncio.gather(*(run(offset) for offset in range(0, len(texts), self.max_batch_size)))
+        except RuntimeError:
+            self._amodels.discard()
+            raise
+        return out if out is not None else np.empty((0, 0), dtype=np.float32)
 
     def embed_query(self, text: str) -> List[float]:
         """Embed a query of documents using Xinference.
@@ -168,13 +585,27 @@ class XinferenceEmbeddings(Embeddings):
             Embeddings for the text.
         """
 
-        model = self.client.get_model(self.model_uid)
+        cached = self._cache_get(text)
+        if cached is not None:
+            return cached
+
+        response = self._embed_direct([text]) if self.fast_path else None
+        if response is not None:
+            embedding = self._parse_embeddings(response)[0]
+            self._cache_set(text, embedding)
+            return embedding
 
-        embedding_res = model.create_embedding(text)
+        model = self._get_model()
 
-        embedding = embedding_res["data"][0]["embedding"]
+        try:
+            embedding_res = model.create_embedding(text)
+        except RuntimeError:
+            self._model = None
+            raise
 
-        return list(map(float, embedding))
+        embedding = list(map(float, embedding_res["data"][0]["embedding"]))
+        self._cache_set(text, embedding)
+        return embedding
 
     async def aembed_query(self, text: str) -> List[float]:
         """Embed a query of documents using Xinference.
@@ -184,10 +615,71 @@ class XinferenceEmbeddings(Embeddings):
             Embeddings for the text.
         """
 
-        model = await self.async_client.get_model(self.model_uid)
+        cached = self._cache_get(text)
+        if cached is not None:
+            return cached
 
-        embedding_res = await model.create_embedding(text)
+        if self._query_batcher is not None:
+            embedding = await self._query_batcher.submit(text)
+            self._cache_set(text, embedding)
+            return embedding
 
-        embedding = embedding_res["data"][0]["embedding"]
+        response = await self._aembed_direct([text]) if self.fast_path else None
+        if response is not None:
+            embedding = self._parse_embeddings(response)[0]
+            self._cache_set(text, embedding)
+            return embedding
 
-        return list(map(float, embedding))
+        model = await self._aget_model()
+
+        try:
+            embedding_res = await model.create_embedding(text)
+        except RuntimeError:
+            self._amodels.discard()
+            raise
+
+        embedding = list(map(float, embedding_res["data"][0]["embedding"]))
+        self._cache_set(text, embedding)
+        return embedding
+
+    def embed_query_np(self, text: str) -> "np.ndarray":
+        """Embed a query of documents using Xinference.
+        Args:
+            text: The text to embed.
+        Returns:
+            A float32 array with the embedding of the text.
+
+        The embedding is copied from the response straight into the array, without going
+        through a Python float list or the embedding cache.
+        """
+
+        np = import_numpy()
+        response = self._embed_direct([text]) if self.fast_path else None
+        if response is None:
+            try:
+                response = self._get_model().create_embedding(text)
+            except RuntimeError:
+                self._model = None
+                raise
+        return np.asarray(response["data"][0]["embedding"], dtype=np.float32)
+
+    async def aembed_query_np(self, text: str) -> "np.ndarray":
+        """Embed a query of documents using Xinference.
+        Args:
+            text: The text to embed.
+        Returns:
+            A float32 array with the embedding of the text.
+
+        The embedding is copied from the response straight into the array, without going
+        through a Python float list, the embedding cache or the query batcher.
+        """
+
+        np = import_numpy()
+        response = await self._aembed_direct([text]) if self.fast_path else None
+        if response is None:
+            try:
+                response = await (await self._aget_model()).create_embedding(text)
+            except RuntimeError:
+                self._amodels.discard()
+                raise
+        return np.asarray(response["data"][0]["embedding"], dtype=np.float32)
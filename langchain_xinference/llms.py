@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import uuid
 from typing import (
     TYPE_CHECKING,
     Any,
@@ -9,16 +10,19 @@ from typing import (
     List,
     Mapping,
     Optional,
+    Tuple,
     Union,
 )
 
-import requests
 from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
     CallbackManagerForLLMRun,
 )
 from langchain_core.language_models.llms import LLM
 from langchain_core.outputs import GenerationChunk
 
+from langchain_xinference._utils import AsyncModelHandles, aget_async_client, client_classes, get_client
+
 if TYPE_CHECKING:
     from xinference.client.handlers import (
         AsyncChatModelHandle,
@@ -29,6 +33,17 @@ if TYPE_CHECKING:
     from xinference.model.llm.core import LlamaCppGenerateConfig
 
 
+# hot path: runs once per streamed token, keep it free of branches.
+def _parse_chunk(chunk: Dict[str, Any]) -> Tuple[str, Any, Any]:
+    """Return the text, logprobs and finish reason of a streamed completion chunk.
+
+    A choice without text, such as the final one carrying only the finish reason, yields "".
+    Raises KeyError, IndexError, TypeError or AttributeError for chunks without a usable choice.
+    """
+    choice = chunk["choices"][0]
+    return choice.get("text", ""), choice.get("logprobs"), choice.get("finish_reason")
+
+
 class Xinference(LLM):
     """`Xinference` large-scale model inference service.
 
@@ -135,17 +150,6 @@ class Xinference(LLM):
         api_key: Optional[str] = None,
         **model_kwargs: Any,
     ):
-        try:
-            from xinference.client import AsyncRESTfulClient, RESTfulClient
-        except ImportError:
-            try:
-                from xinference_client import AsyncRESTfulClient, RESTfulClient
-            except ImportError as e:
-                raise ImportError(
-                    "Could not import RESTfulClient from xinference. Please install it"
-                    " with `pip install xinference` or `pip install xinference_client`."
-                ) from e
-
         model_kwargs = model_kwargs or {}
 
         super().__init__(
@@ -162,17 +166,12 @@ class Xinference(LLM):
         if self.model_uid is None:
             raise ValueError("Please provide the model UID")
 
-        self._headers: Dict[str, str] = {}
-        self._cluster_authed = False
-        self._check_cluster_authenticated()
-        if api_key is not None and self._cluster_authed:
-            self._headers["Authorization"] = f"Bearer {api_key}"
+        # fail early when neither xinference nor xinference_client is installed
+        client_classes()
+        self._api_key = api_key
 
-        self.client = RESTfulClient(server_url, api_key)
-        try:
-            self.async_client = AsyncRESTfulClient(server_url, api_key)
-        except RuntimeError:
-            self.async_client = None
+        self._model: Any = None
+        self._amodels = AsyncModelHandles()
 
     @property
     def _llm_type(self) -> str:
@@ -188,16 +187,76 @@ class Xinference(LLM):
             **{"model_kwargs": self.model_kwargs},
         }
 
-    def _check_cluster_authenticated(self) -> None:
-        url = f"{self.server_url}/v1/cluster/auth"
-        response = requests.get(url)
-        if response.status_code == 404:
-            self._cluster_authed = False
-        else:
-            if response.status_code != 200:
-                raise RuntimeError(f"Failed to get cluster information, detail: {response.json()['detail']}")
-            response_data = response.json()
-            self._cluster_authed = bool(response_data["auth"])
+    def _get_client(self) -> Any:
+        """Return the RESTful client, building it on first use."""
+        if self.client is None:
+            self.client = get_client(self.server_url, self._api_key)
+        return self.client
+
+    async def _aget_async_client(self) -> Any:
+        """Return the async RESTful client of the running event loop, building it on first use."""
+        if self.async_client is not None:
+            return self.async_client
+        return await aget_async_client(self.server_url, self._api_key)
+
+    def _get_model(self) -> Any:
+        """Return the model handle, resolving it on the server only once."""
+        if self._model is None:
+            self._model = self._get_client().get_model(self.model_uid)
+        return self._model
+
+    async def _aget_model(self) -> Any:
+        """Return the async model handle of the running event loop, resolving it on the server only once."""
+        return await self._amodels.get(self._aresolve_model)
+
+    async def _aresolve_model(self) -> Any:
+        async_client = await self._aget_async_client()
+        return await async_client.get_model(self.model_uid)
+
+    async def aclose(self) -> None:
+        """Close the async model handles of this instance.
+
+        The sessions shared with other models are left open, see `aclose_async_sessions`.
+        """
+        await self._amodels.aclose()
+
+    def _build_generate_config(
+        self,
+        stop: Optional[List[str]],
+        generate_config: Optional[Dict[str, Any]],
+        run_manager: Optional[Union[CallbackManagerForLLMRun, AsyncCallbackManagerForLLMRun]] = None,
+        stream: bool = False,
+    ) -> Dict[str, Any]:
+        """Merge the per-call generate_config over the model kwargs into a fresh dict.
+
+        The request is tagged with an id so the server can batch and abort it. Unless the
+        caller sets `request_id`, it is the hex run id of the call.
+        """
+        config = {**self.model_kwargs, **(generate_config or {})}
+        if stop:
+            config["stop"] = stop
+        if stream and not config.get("stream"):
+            config["stream"] = True
+        if "request_id" not in config:
+            config["request_id"] = run_manager.run_id.hex if run_manager else uuid.uuid4().hex
+        return config
+
+    def abort(self, request_id: str, block_duration: int = 30) -> None:
+        """Abort a generation running on the xinference server.
+
+        Args:
+            request_id: The request to abort. Either the `request_id` passed in the
+                generate_config, or the hex of the run id set with
+                `config={"run_id": run_id}` when invoking the LLM.
+            block_duration: Seconds the server keeps rejecting the request id, so an abort
+                that arrives before the request still takes effect.
+        """
+        self._get_client().abort_request(self.model_uid, request_id, block_duration)
+
+    async def aabort(self, request_id: str, block_duration: int = 30) -> None:
+        """Async version of `abort`."""
+        async_client = await self._aget_async_client()
+        await async_client.abort_request(self.model_uid, request_id, block_duration)
 
     def _call(
         self,
@@ -217,37 +276,37 @@ class Xinference(LLM):
         Returns:
             The generated string by the model.
         """
-        if self.client is None:
-            raise ValueError("Client is not initialized!")
-        model = self.client.get_model(self.model_uid)
+        model = self._get_model()
 
-        generate_config: "LlamaCppGenerateConfig" = kwargs.get("generate_config", {})
+        generate_config = self._build_generate_config(stop, kwargs.get("generate_config"), run_manager)
+        if generate_config.get("stream") and not (run_manager and run_manager.handlers):
+            # No callback observes the tokens, so let the server return the whole completion.
+            generate_config["stream"] = False
 
-        generate_config = {**self.model_kwargs, **generate_config}
+        try:
+            if generate_config and generate_config.get("stream"):
+                text_parts: List[str] = []
+                for token in self._stream_generate(
+                    model=model,
+                    prompt=prompt,
+                    run_manager=run_manager,
+                    generate_config=generate_config,
+                ):
+                    text_parts.append(token)
+                return "".join(text_parts)
 
-        if stop:
-            generate_config["stop"] = stop
-
-        if generate_config and generate_config.get("stream"):
-            combined_text_output = ""
-            for token in self._stream_generate(
-                model=model,
-                prompt=prompt,
-                run_manager=run_manager,
-                generate_config=generate_config,
-            ):
-                combined_text_output += token
-            return combined_text_output
-
-        else:
-            completion = model.generate(prompt=prompt, generate_config=generate_config)
-            return completion["choices"][0]["text"]
+            else:
+                completion = model.generate(prompt=prompt, generate_config=generate_config)
+                return completion["choices"][0]["text"]
+        except RuntimeError:
+            self._model = None
+            raise
 
     async def _acall(
         self,
         prompt: str,
         stop: Optional[List[str]] = None,
-        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
         **kwargs: Any,
     ) -> str:
         """Call the xinference model and return the output.
@@ -261,31 +320,31 @@ class Xinference(LLM):
         Returns:
             The generated string by the model.
         """
-        if self.async_client is None:
-            raise ValueError("Client is not initialized!")
-        model = await self.async_client.get_model(self.model_uid)
+        model = await self._aget_model()
 
-        generate_config: "LlamaCppGenerateConfig" = kwargs.get("generate_config", {})
+        generate_config = self._build_generate_config(stop, kwargs.get("generate_config"), run_manager)
+        if generate_config.get("stream") and not (run_manager and run_manager.handlers):
+            # No callback observes the tokens, so let the server return the whole completion.
+            generate_config["stream"] = False
 
-        generate_config = {**self.model_kwargs, **generate_config}
+        try:
+            if generate_config and generate_config.get("stream"):
+                text_parts: List[str] = []
+                async for token in self._astream_generate(
+                    model=model,
+                    prompt=prompt,
+                    run_manager=run_manager,
+                    generate_config=generate_config,
+                ):
+                    text_parts.append(token)
+                return "".join(text_parts)
 
-        if stop:
-            generate_config["stop"] = stop
-
-        if generate_config and generate_config.get("stream"):
-            combined_text_output = ""
-            async for token in self._astream_generate(
-                model=model,
-                prompt=prompt,
-                run_manager=run_manager,
-                generate_config=generate_config,
-            ):
-                combined_text_output += token
-            return combined_text_output
-
-        else:
-            completion = await model.generate(prompt=prompt, generate_config=generate_config)
-            return completion["choices"][0]["text"]
+            else:
+                completion = await model.generate(prompt=prompt, generate_config=generate_config)
+                return completion["choices"][0]["text"]
+        except RuntimeError:
+            self._amodels.discard()
+            raise
 
     def _stream_generate(
         self,
@@ -306,23 +365,22 @@ class Xinference(LLM):
             A string token.
         """
         streaming_response = model.generate(prompt=prompt, generate_config=generate_config)
+        on_llm_new_token = run_manager.on_llm_new_token if run_manager else None
+        verbose = self.verbose
         for chunk in streaming_response:
-            if isinstance(chunk, dict):
-                choices = chunk.get("choices", [])
-                if choices:
-                    choice = choices[0]
-                    if isinstance(choice, dict):
-                        token = choice.get("text", "")
-                        log_probs = choice.get("logprobs")
-                        if run_manager:
-                            run_manager.on_llm_new_token(token=token, verbose=self.verbose, log_probs=log_probs)
-                        yield token
+            try:
+                token, log_probs, _ = _parse_chunk(chunk)
+            except (KeyError, IndexError, TypeError, AttributeError):
+                continue
+            if on_llm_new_token is not None:
+                on_llm_new_token(token=token, verbose=verbose, log_probs=log_probs)
+            yield token
 
     async def _astream_generate(
         self,
         model: Union["AsyncGenerateModelHandle", "AsyncChatModelHandle"],
         prompt: str,
-        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
         generate_config: Optional["LlamaCppGenerateConfig"] = None,
     ) -> AsyncIterator[str]:
         """
@@ -337,17 +395,16 @@ class Xinference(LLM):
             A string token.
         """
         streaming_response = await model.generate(prompt=prompt, generate_config=generate_config)
+        on_llm_new_token = run_manager.on_llm_new_token if run_manager else None
+        verbose = self.verbose
         async for chunk in streaming_response:
-            if isinstance(chunk, dict):
-                choices = chunk.get("choices", [])
-                if choices:
-                    choice = choices[0]
-                    if isinstance(choice, dict):
-                        token = choice.get("text", "")
-                        log_probs = choice.get("logprobs")
-                        if run_manager:
-                            run_manager.on_llm_new_token(token=token, verbose=self.verbose, log_probs=log_probs)
-                        yield token
+            try:
+                token, log_probs, _ = _parse_chunk(chunk)
+            except (KeyError, IndexError, TypeError, AttributeError):
+                continue
+            if on_llm_new_token is not None:
+                await on_llm_new_token(token=token, verbose=verbose, log_probs=log_probs)
+            yield token
 
     def _stream(
         self,
@@ -356,74 +413,56 @@ class Xinference(LLM):
         run_manager: Optional[CallbackManagerForLLMRun] = None,
         **kwargs: Any,
     ) -> Iterator[GenerationChunk]:
-        generate_config = kwargs.get("generate_config", {})
-        generate_config = {**self.model_kwargs, **generate_config}
-        if stop:
-            generate_config["stop"] = stop
-        if "stream" not in generate_config or not generate_config.get("stream", False):
-            generate_config["stream"] = True
-        if self.client is None:
-            raise ValueError("Client is not initialized!")
-        model = self.client.get_model(self.model_uid)
-        for stream_resp in model.generate(prompt=prompt, generate_config=generate_config):
-            if stream_resp:
-                chunk = self._stream_response_to_generation_chunk(stream_resp)
-                if run_manager:
-                    run_manager.on_llm_new_token(
-                        chunk.text,
-                        verbose=self.verbose,
-                    )
-                yield chunk
+        generate_config = self._build_generate_config(stop, kwargs.get("generate_config"), run_manager, stream=True)
+        model = self._get_model()
+        on_llm_new_token = run_manager.on_llm_new_token if run_manager else None
+        verbose = self.verbose
+        try:
+            for stream_resp in model.generate(prompt=prompt, generate_config=generate_config):
+                if stream_resp:
+                    chunk = self._stream_response_to_generation_chunk(stream_resp)
+                    if on_llm_new_token is not None:
+                        on_llm_new_token(chunk.text, verbose=verbose)
+                    yield chunk
+        except RuntimeError:
+            self._model = None
+            raise
 
     async def _astream(
         self,
         prompt: str,
         stop: Optional[List[str]] = None,
-        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
         **kwargs: Any,
     ) -> AsyncIterator[GenerationChunk]:
-        generate_config = kwargs.get("generate_config", {})
-        generate_config = {**self.model_kwargs, **generate_config}
-        if stop:
-            generate_config["stop"] = stop
-        if "stream" not in generate_config or not generate_config.get("stream", False):
-            generate_config["stream"] = True
-        if self.async_client is None:
-            raise ValueError("Client is not initialized!")
-        model = await self.async_client.get_model(self.model_uid)
-        async for stream_resp in await model.generate(prompt=prompt, generate_config=generate_config):
-            if stream_resp:
-                chunk = self._stream_response_to_generation_chunk(stream_resp)
-                if run_manager:
-                    run_manager.on_llm_new_token(
-                        chunk.text,
-                        verbose=self.verbose,
-                    )
-                yield chunk
+        generate_config = self._build_generate_config(stop, kwargs.get("generate_config"), run_manager, stream=True)
+        model = await self._aget_model()
+        on_llm_new_token = run_manager.on_llm_new_token if run_manager else None
+        verbose = self.verbose
+        try:
+            async for stream_resp in await model.generate(prompt=prompt, generate_config=generate_config):
+                if stream_resp:
+                    chunk = self._stream_response_to_generation_chunk(stream_resp)
+                    if on_llm_new_token is not None:
+                        await on_llm_new_token(chunk.text, verbose=verbose)
+                    yield chunk
+        except RuntimeError:
+            self._amodels.discard()
+            raise
 
     @staticmethod
     def _stream_response_to_generation_chunk(
         stream_response: str,
     ) -> GenerationChunk:
         """Convert a stream response to a generation chunk."""
-        token = ""
-        if isinstance(stream_response, dict):
-            choices = stream_response.get("choices", [])
-            if choices:
-                choice = choices[0]
-                if isinstance(choice, dict):
-                    token = choice.get("text", "")
-
-                    return GenerationChunk(
-                        text=token,
-                        generation_info=dict(
-                            finish_reason=choice.get("finish_reason", None),
-                            logprobs=choice.get("logprobs", None),
-                        ),
-                    )
-                else:
-                    raise TypeError("choice type error!")
-            else:
-                return GenerationChunk(text=token)
-        else:
-            raise TypeError("stream_response type error!")
+        try:
+            text, logprobs, finish_reason = _parse_chunk(stream_response)
+        except (KeyError, IndexError):
+            return GenerationChunk(text="")
+        except (TypeError, AttributeError) as e:
+            raise TypeError("stream_response type error!") from e
+
+        return GenerationChunk(
+            text=text,
+            generation_info=dict(finish_reason=finish_reason, logprobs=logprobs),
+        )
@@ -1,10 +1,11 @@
 # python
 from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Union
 
-import requests
 from langchain_core.documents import BaseDocumentCompressor, Document
 from pydantic import ConfigDict
 
+from langchain_xinference._utils import aget_async_client, client_classes, get_client
+
 
 class XinferenceRerank(BaseDocumentCompressor):
     """Document compressor that uses `Xinference Rerank API`."""
@@ -26,17 +27,6 @@ class XinferenceRerank(BaseDocumentCompressor):
         model_uid: Optional[str] = None,
         api_key: Optional[str] = None,
     ):
-        try:
-            from xinference.client import AsyncRESTfulClient, RESTfulClient
-        except ImportError:
-            try:
-                from xinference_client import AsyncRESTfulClient, RESTfulClient
-            except ImportError as e:
-                raise ImportError(
-                    "Could not import RESTfulClient from xinference. Please install it"
-                    " with `pip install xinference` or `pip install xinference_client`."
-                ) from e
-
         super().__init__(
             **{  # type: ignore[arg-type]
                 "server_url": server_url,
@@ -50,29 +40,21 @@ class XinferenceRerank(BaseDocumentCompressor):
         if self.model_uid is None:
             raise ValueError("Please provide the model UID")
 
-        self._headers: Dict[str, str] = {}
-        self._cluster_authed = False
-        self._check_cluster_authenticated()
-        if api_key is not None and self._cluster_authed:
-            self._headers["Authorization"] = f"Bearer {api_key}"
-
-        self.client = RESTfulClient(server_url, api_key)
-        try:
-            self.async_client = AsyncRESTfulClient(server_url, api_key)
-        except RuntimeError:
-            self.async_client = None
-
-    def _check_cluster_authenticated(self) -> None:
-        url = f"{self.server_url}/v1/cluster/auth"
-        response = requests.get(url)
-        if response.status_code == 404:
-            self._cluster_authed = False
-        else:
-            if response.status_code != 200:
-                raise RuntimeError(f"Failed to get cluster information, detail: {response.json()['detail']}")
-            response_data = response.json()
+        # fail early when neither xinference nor xinference_client is installed
+        client_classes()
+        self._api_key = api_key
+
+    def _get_client(self) -> Any:
+        """Return the RESTful client, building it on first use."""
+        if self.client is None:
+            self.client = get_client(self.server_url, self._api_key)
+        return self.client
 
-            self._cluster_authed = bool(response_data["auth"])
+    async def _aget_async_client(self) -> Any:
+        """Return the async RESTful client of the running event loop, building it on first use."""
+        if self.async_client is not None:
+            return self.async_client
+        return await aget_async_client(self.server_url, self._api_key)
 
     def _rerank(
         self,
@@ -89,7 +71,7 @@ class XinferenceRerank(BaseDocumentCompressor):
             items = []
         else:
             docs = [doc.page_content if isinstance(doc, Document) else doc for doc in documents]
-            model = self.client.get_model(self.model_uid)
+            model = self._get_client().get_model(self.model_uid)
             top_n = top_n if (top_n is not None and top_n > 0) else self.top_n
             results = model.rerank(
                 documents=docs,
@@ -121,7 +103,8 @@ class XinferenceRerank(BaseDocumentCompressor):
             items = []
         else:
             docs = [doc.page_content if isinstance(doc, Document) else doc for doc in documents]
-            model = await self.async_client.get_model(self.model_uid)
+            async_client = await self._aget_async_client()
+            model = await async_client.get_model(self.model_uid)
             top_n = top_n if (top_n is not None and top_n > 0) else self.top_n
             results = await model.rerank(
                 documents=docs,
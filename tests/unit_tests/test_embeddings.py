@@ -0,0 +1,437 @@
+"""Test Xinference embeddings."""
+
+import asyncio
+from typing import Any, Dict, List, Union
+from unittest import mock
+
+import pytest
+
+from langchain_xinference import embeddings as embeddings_module
+from langchain_xinference.embeddings import XinferenceEmbeddings, _EmbeddingCache
+
+
+def _make_embeddings(**kwargs: Any) -> XinferenceEmbeddings:
+    return XinferenceEmbeddings(server_url="http://xinference", model_uid="bge", **kwargs)
+
+
+def _use_async_model(embeddings: XinferenceEmbeddings, model: Any) -> None:
+    embeddings.async_client = mock.MagicMock()
+    embeddings.async_client.get_model = mock.AsyncMock(return_value=model)
+
+
+def _embedding_response(embeddings: List[List[float]]) -> Dict[str, Any]:
+    return {"data": [{"index": i, "embedding": embedding} for i, embedding in enumerate(embeddings)]}
+
+
+def _create_embedding(texts: Union[str, List[str]]) -> Dict[str, Any]:
+    """Embed each text as [len(text)], listing the items in reverse to exercise the reordering."""
+    if isinstance(texts, str):
+        texts = [texts]
+    response = _embedding_response([[float(len(text))] for text in texts])
+    response["data"].reverse()
+    return response
+
+
+class _FakeAsyncResponse:
+    def __init__(self, status: int, content: bytes):
+        self.status = status
+        self.ok = status < 400
+        self.reason = "Error"
+        self._content = content
+
+    async def read(self) -> bytes:
+        return self._content
+
+    async def __aenter__(self) -> "_FakeAsyncResponse":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        return None
+
+
+def _rejecting_list_input(texts: Union[str, List[str]]) -> Dict[str, Any]:
+    if isinstance(texts, list):
+        raise RuntimeError("Failed to create the embeddings, detail: input: Input should be a valid string")
+    return _create_embedding(texts)
+
+
+def test_embed_documents_splits_batches() -> None:
+    embeddings = _make_embeddings(max_batch_size=2)
+    model = mock.MagicMock()
+    model.create_embedding.side_effect = _create_embedding
+    embeddings._model = model
+
+    assert embeddings.embed_documents(["a", "bb", "ccc", "dddd", "eeeee"]) == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+    assert [call.args[0] for call in model.create_embedding.call_args_list] == [
+        ["a", "bb"],
+        ["ccc", "dddd"],
+        ["eeeee"],
+    ]
+
+
+def test_embed_documents_falls_back_when_list_input_is_rejected() -> None:
+    embeddings = _make_embeddings()
+    model = mock.MagicMock()
+    model.create_embedding.side_effect = _rejecting_list_input
+    embeddings._model = model
+
+    assert embeddings.embed_documents(["a", "bb"]) == [[1.0], [2.0]]
+    assert [call.args[0] for call in model.create_embedding.call_args_list] == [["a", "bb"], "a", "bb"]
+
+
+def test_embed_documents_raises_other_errors() -> None:
+    embeddings = _make_embeddings()
+    model = mock.MagicMock()
+    model.create_embedding.side_effect = RuntimeError("Failed to create the embeddings, detail: model crashed")
+    embeddings._model = model
+
+    with pytest.raises(RuntimeError, match="model crashed"):
+        embeddings.embed_documents(["a", "bb"])
+
+    model.create_embedding.assert_called_once_with(["a", "bb"])
+
+
+async def test_aembed_documents_falls_back_when_list_input_is_rejected() -> None:
+    embeddings = _make_embeddings()
+    model = mock.MagicMock()
+    model.create_embedding = mock.AsyncMock(side_effect=_rejecting_list_input)
+    _use_async_model(embeddings, model)
+
+    assert await embeddings.aembed_documents(["a", "bb"]) == [[1.0], [2.0]]
+
+
+def test_embed_documents_merges_cached_embeddings_in_order() -> None:
+    embeddings = _make_embeddings(cache_size=8)
+    model = mock.MagicMock()
+    model.create_embedding.side_effect = _create_embedding
+    embeddings._model = model
+
+    embeddings.embed_documents(["a", "bb"])
+    model.create_embedding.reset_mock()
+
+    assert embeddings.embed_documents(["ccc", "a", "bb", "dddd"]) == [[3.0], [1.0], [2.0], [4.0]]
+    model.create_embedding.assert_called_once_with(["ccc", "dddd"])
+
+
+def test_embed_documents_does_not_cache_by_default() -> None:
+    embeddings = _make_embeddings()
+    model = mock.MagicMock()
+    model.create_embedding.side_effect = _create_embedding
+    embeddings._model = model
+
+    embeddings.embed_documents(["a"])
+    embeddings.embed_documents(["a"])
+
+    assert model.create_embedding.call_count == 2
+
+
+def test_embedding_cache_evicts_least_recently_used() -> None:
+    cache = _EmbeddingCache(maxsize=2)
+    cache.set("bge", "a", [1.0])
+    cache.set("bge", "b", [2.0])
+    assert cache.get("bge", "a") == [1.0]
+
+    cache.set("bge", "c", [3.0])
+
+    assert cache.get("bge", "b") is None
+    assert cache.get("bge", "a") == [1.0]
+    assert cache.get("bge", "c") == [3.0]
+    assert cache.get("other-model", "a") is None
+
+
+def test_embedding_cache_expires_entries() -> None:
+    cache = _EmbeddingCache(maxsize=2, ttl=10)
+    with mock.patch.object(embeddings_module.time, "monotonic", return_value=100.0):
+        cache.set("bge", "a", [1.0])
+    with mock.patch.object(embeddings_module.time, "monotonic", return_value=110.0):
+        assert cache.get("bge", "a") == [1.0]
+    with mock.patch.object(embeddings_module.time, "monotonic", return_value=110.5):
+        assert cache.get("bge", "a") is None
+
+
+async def test_aembed_documents_limits_concurrent_batches() -> None:
+    embeddings = _make_embeddings(max_batch_size=1, max_concurrency=2)
+    running = peak = 0
+
+    async def create_embedding(texts: List[str]) -> Dict[str, Any]:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return _create_embedding(texts)
+
+    model = mock.MagicMock()
+    model.create_embedding = mock.AsyncMock(side_effect=create_embedding)
+    _use_async_model(embeddings, model)
+
+    assert await embeddings.aembed_documents(["a", "bb", "ccc", "dddd", "eeeee"]) == [
+        [1.0],
+        [2.0],
+        [3.0],
+        [4.0],
+        [5.0],
+    ]
+    assert model.create_embedding.await_count == 5
+    assert peak == 2
+
+
+def test_async_model_handle_is_resolved_per_event_loop() -> None:
+    embeddings = _make_embeddings()
+
+    async def get_model(model_uid: str) -> Any:
+        loop = asyncio.get_running_loop()
+
+        async def create_embedding(texts: List[str]) -> Dict[str, Any]:
+            assert asyncio.get_running_loop() is loop, "handle used outside the loop that resolved it"
+            return _create_embedding(texts)
+
+        model = mock.MagicMock()
+        model.create_embedding = create_embedding
+        return model
+
+    embeddings.async_client = mock.MagicMock()
+    embeddings.async_client.get_model = mock.AsyncMock(side_effect=get_model)
+
+    assert asyncio.run(embeddings.aembed_documents(["a"])) == [[1.0]]
+    assert asyncio.run(embeddings.aembed_documents(["a"])) == [[1.0]]
+
+    assert embeddings.async_client.get_model.await_count == 2
+    # the handle of the first, closed loop was released when the second loop resolved its own
+    assert len(embeddings._amodels._handles) == 1
+
+
+async def test_aembed_query_batches_concurrent_queries() -> None:
+    embeddings = _make_embeddings(query_batch_wait_ms=5)
+    model = mock.MagicMock()
+    model.create_embedding = mock.AsyncMock(side_effect=_create_embedding)
+    _use_async_model(embeddings, model)
+
+    results = await asyncio.gather(*(embeddings.aembed_query(text) for text in ["a", "bb", "ccc"]))
+
+    assert results == [[1.0], [2.0], [3.0]]
+    model.create_embedding.assert_awaited_once_with(["a", "bb", "ccc"])
+    # the worker exits once every queued query has been dispatched
+    await asyncio.sleep(0)
+    assert embeddings._query_batcher is not None
+    assert embeddings._query_batcher._worker is not None
+    assert embeddings._query_batcher._worker.done()
+
+
+async def test_aembed_query_runs_batches_concurrently() -> None:
+    embeddings = _make_embeddings(max_batch_size=1, max_concurrency=2, query_batch_wait_ms=0)
+    running = peak = 0
+
+    async def create_embedding(texts: List[str]) -> Dict[str, Any]:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return _create_embedding(texts)
+
+    model = mock.MagicMock()
+    model.create_embedding = mock.AsyncMock(side_effect=create_embedding)
+    _use_async_model(embeddings, model)
+
+    results = await asyncio.gather(*(embeddings.aembed_query(text) for text in ["a", "bb", "ccc", "dddd"]))
+
+    assert results == [[1.0], [2.0], [3.0], [4.0]]
+    assert model.create_embedding.await_count == 4
+    assert peak == 2
+
+
+async def test_aembed_query_batch_errors_reach_every_caller() -> None:
+    embeddings = _make_embeddings(query_batch_wait_ms=5)
+    model = mock.MagicMock()
+    model.create_embedding = mock.AsyncMock(side_effect=RuntimeError("model crashed"))
+    _use_async_model(embeddings, model)
+
+    results = await asyncio.gather(
+        *(embeddings.aembed_query(text) for text in ["a", "bb"]),
+        return_exceptions=True,
+    )
+
+    assert [str(result) for result in results] == ["model crashed", "model crashed"]
+
+
+async def test_aclose_cancels_pending_queries() -> None:
+    embeddings = _make_embeddings(query_batch_wait_ms=0)
+
+    async def create_embedding(texts: List[str]) -> Dict[str, Any]:
+        await asyncio.Event().wait()
+        return _create_embedding(texts)
+
+    model = mock.MagicMock()
+    model.create_embedding = mock.AsyncMock(side_effect=create_embedding)
+    model.close = mock.AsyncMock()
+    _use_async_model(embeddings, model)
+
+    query = asyncio.ensure_future(embeddings.aembed_query("a"))
+    await asyncio.sleep(0.01)
+    await embeddings.aclose()
+
+    with pytest.raises(asyncio.CancelledError):
+        await query
+
+
+async def test_aclose_closes_own_model_handle_only() -> None:
+    embeddings = _make_embeddings()
+    model = mock.MagicMock()
+    model.close = mock.AsyncMock()
+    _use_async_model(embeddings, model)
+    await embeddings._aget_model()
+    shared = embeddings_module.get_async_session()
+
+    await embeddings.aclose()
+
+    model.close.assert_awaited_once()
+    assert not shared.closed
+    assert embeddings._amodels._handles == {}
+
+
+@pytest.mark.parametrize("status", [404, 405])
+def test_fast_path_falls_back_when_endpoint_is_missing(status: int) -> None:
+    embeddings = _make_embeddings(fast_path=True)
+    model = mock.MagicMock()
+    model.create_embedding.return_value = _embedding_response([[1.0, 2.0]])
+    embeddings._model = model
+
+    response = mock.MagicMock(status_code=status, ok=False, content=b"")
+    with mock.patch.object(XinferenceEmbeddings, "_session") as session:
+        session.post.return_value = response
+        assert embeddings.embed_documents(["a"]) == [[1.0, 2.0]]
+
+    model.create_embedding.assert_called_once_with(["a"])
+
+
+def test_fast_path_raises_server_errors() -> None:
+    embeddings = _make_embeddings(fast_path=True)
+    model = mock.MagicMock()
+    embeddings._model = model
+
+    response = mock.MagicMock(status_code=500, ok=False, content=b'{"detail": "model crashed"}')
+    with mock.patch.object(XinferenceEmbeddings, "_session") as session:
+        session.post.return_value = response
+        with pytest.raises(RuntimeError, match="model crashed"):
+            embeddings.embed_documents(["a"])
+
+    model.create_embedding.assert_not_called()
+
+
+@pytest.mark.parametrize("status", [404, 405])
+async def test_async_fast_path_falls_back_when_endpoint_is_missing(status: int) -> None:
+    embeddings = _make_embeddings(fast_path=True)
+    model = mock.MagicMock()
+    model.create_embedding = mock.AsyncMock(return_value=_embedding_response([[1.0, 2.0]]))
+    _use_async_model(embeddings, model)
+
+    session = mock.MagicMock()
+    session.post.return_value = _FakeAsyncResponse(status, b"")
+    with mock.patch.object(embeddings_module, "get_async_session", return_value=session):
+        assert await embeddings.aembed_documents(["a"]) == [[1.0, 2.0]]
+
+    model.create_embedding.assert_awaited_once_with(["a"])
+
+
+async def test_async_fast_path_raises_server_errors() -> None:
+    embeddings = _make_embeddings(fast_path=True)
+    model = mock.MagicMock()
+    model.create_embedding = mock.AsyncMock()
+    _use_async_model(embeddings, model)
+
+    session = mock.MagicMock()
+    session.post.return_value = _FakeAsyncResponse(500, b'{"detail": "model crashed"}')
+    with mock.patch.object(embeddings_module, "get_async_session", return_value=session):
+        with pytest.raises(RuntimeError, match="model crashed"):
+            await embeddings.aembed_documents(["a"])
+
+    model.create_embedding.assert_not_awaited()
+
+
+def test_fast_path_does_not_resolve_the_model() -> None:
+    embeddings = _make_embeddings(fast_path=True)
+
+    response = mock.MagicMock(status_code=200, ok=True, content=b'{"data": [{"index": 0, "embedding": [1.0]}]}')
+    with mock.patch.object(XinferenceEmbeddings, "_session") as session:
+        session.post.return_value = response
+        with mock.patch.object(embeddings_module, "get_client") as get_client:
+            assert embeddings.embed_documents(["a"]) == [[1.0]]
+
+    get_client.assert_not_called()
+    assert embeddings._model is None
+
+
+async def test_async_fast_path_does_not_resolve_the_model() -> None:
+    embeddings = _make_embeddings(fast_path=True)
+
+    session = mock.MagicMock()
+    session.post.return_value = _FakeAsyncResponse(200, b'{"data": [{"index": 0, "embedding": [1.0]}]}')
+    with mock.patch.object(embeddings_module, "get_async_session", return_value=session):
+        with mock.patch.object(embeddings_module, "aget_async_client") as aget_async_client:
+            assert await embeddings.aembed_documents(["a"]) == [[1.0]]
+
+    aget_async_client.assert_not_called()
+
+
+def test_embed_documents_np_fills_float32_rows_in_order() -> None:
+    np = pytest.importorskip("numpy")
+    embeddings = _make_embeddings(max_batch_size=2, cache_size=8)
+    model = mock.MagicMock()
+    model.create_embedding.side_effect = _create_embedding
+    embeddings._model = model
+
+    result = embeddings.embed_documents_np(["a", "bb", "ccc"])
+
+    assert result.dtype == np.float32
+    assert result.tolist() == [[1.0], [2.0], [3.0]]
+    assert embeddings._cache_get("a") is None
+
+
+def test_embed_documents_np_of_no_texts_is_empty() -> None:
+    np = pytest.importorskip("numpy")
+
+    result = _make_embeddings().embed_documents_np([])
+
+    assert result.shape == (0, 0) and result.dtype == np.float32
+
+
+async def test_aembed_documents_np_fills_float32_rows_in_order() -> None:
+    np = pytest.importorskip("numpy")
+    embeddings = _make_embeddings(max_batch_size=2)
+    model = mock.MagicMock()
+    model.create_embedding = mock.AsyncMock(side_effect=_rejecting_list_input)
+    _use_async_model(embeddings, model)
+
+    result = await embeddings.aembed_documents_np(["a", "bb", "ccc"])
+
+    assert result.dtype == np.float32
+    assert result.tolist() == [[1.0], [2.0], [3.0]]
+
+
+def test_embed_query_np_returns_float32_array() -> None:
+    np = pytest.importorskip("numpy")
+    embeddings = _make_embeddings(cache_size=8)
+    model = mock.MagicMock()
+    model.create_embedding.side_effect = _create_embedding
+    embeddings._model = model
+
+    result = embeddings.embed_query_np("abc")
+
+    assert result.dtype == np.float32
+    assert result.tolist() == [3.0]
+    assert embeddings._cache_get("abc") is None
+
+
+async def test_aembed_query_np_bypasses_the_query_batcher() -> None:
+    np = pytest.importorskip("numpy")
+    embeddings = _make_embeddings(query_batch_wait_ms=0)
+    model = mock.MagicMock()
+    model.create_embedding = mock.AsyncMock(side_effect=_create_embedding)
+    _use_async_model(embeddings, model)
+
+    result = await embeddings.aembed_query_np("abc")
+
+    assert result.dtype == np.float32
+    assert result.tolist() == [3.0]
+    model.create_embedding.assert_awaited_once_with("abc")
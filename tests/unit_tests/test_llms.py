@@ -1,8 +1,13 @@
 """Test llms model integration."""
 
-from typing import Type
+import asyncio
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Type
+from unittest import mock
 
-from langchain_xinference.llms import Xinference
+from langchain_core.callbacks import AsyncCallbackHandler, BaseCallbackHandler
+
+from langchain_xinference.llms import Xinference, _parse_chunk
 from langchain_tests.integration_tests import ChatModelIntegrationTests
 
 class TestChatParrotLinkIntegration(ChatModelIntegrationTests):
@@ -18,3 +23,164 @@ class TestChatParrotLinkIntegration(ChatModelIntegrationTests):
             "temperature": 0,
             "parrot_buffer_length": 50,
         }
+
+
+class _TokenCollector(BaseCallbackHandler):
+    def __init__(self) -> None:
+        self.tokens: List[str] = []
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        self.tokens.append(token)
+
+
+class _AsyncTokenCollector(AsyncCallbackHandler):
+    def __init__(self) -> None:
+        self.tokens: List[str] = []
+
+    async def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        await asyncio.sleep(0)
+        self.tokens.append(token)
+
+
+def _make_llm(**model_kwargs: Any) -> Xinference:
+    return Xinference(server_url="http://xinference", model_uid="qwen", **model_kwargs)
+
+
+def _completion(text: str) -> Dict[str, Any]:
+    return {"choices": [{"text": text}]}
+
+
+def _chunks() -> List[Dict[str, Any]]:
+    return [
+        {"choices": [{"text": "Hel"}]},
+        {"choices": [{"text": "lo"}]},
+        {"choices": [{"finish_reason": "stop"}]},
+    ]
+
+
+def test_async_model_handle_is_resolved_per_event_loop() -> None:
+    llm = _make_llm()
+
+    async def get_model(model_uid: str) -> Any:
+        loop = asyncio.get_running_loop()
+
+        async def generate(prompt: str, generate_config: Dict[str, Any]) -> Dict[str, Any]:
+            assert asyncio.get_running_loop() is loop, "handle used outside the loop that resolved it"
+            return _completion("Hello")
+
+        model = mock.MagicMock()
+        model.generate = generate
+        return model
+
+    llm.async_client = mock.MagicMock()
+    llm.async_client.get_model = mock.AsyncMock(side_effect=get_model)
+
+    assert asyncio.run(llm.ainvoke("Hi")) == "Hello"
+    assert asyncio.run(llm.ainvoke("Hi")) == "Hello"
+    assert llm.async_client.get_model.await_count == 2
+
+
+def test_request_id_is_the_run_id() -> None:
+    llm = _make_llm()
+    llm._model = mock.MagicMock()
+    llm._model.generate.return_value = _completion("Hello")
+    run_id = uuid.uuid4()
+
+    llm.invoke("Hi", config={"run_id": run_id})
+
+    assert llm._model.generate.call_args.kwargs["generate_config"]["request_id"] == run_id.hex
+
+
+def test_request_id_of_the_caller_is_kept() -> None:
+    llm = _make_llm()
+    llm._model = mock.MagicMock()
+    llm._model.generate.return_value = _completion("Hello")
+
+    llm.invoke("Hi", generate_config={"request_id": "mine"})
+
+    assert llm._model.generate.call_args.kwargs["generate_config"]["request_id"] == "mine"
+
+
+def test_abort_aborts_the_request_on_the_server() -> None:
+    llm = _make_llm()
+    llm.client = mock.MagicMock()
+
+    llm.abort("abc")
+
+    llm.client.abort_request.assert_called_once_with("qwen", "abc", 30)
+
+
+async def test_aabort_aborts_the_request_on_the_server() -> None:
+    llm = _make_llm()
+    llm.async_client = mock.MagicMock()
+    llm.async_client.abort_request = mock.AsyncMock()
+
+    await llm.aabort("abc", block_duration=5)
+
+    llm.async_client.abort_request.assert_awaited_once_with("qwen", "abc", 5)
+
+
+async def test_astream_awaits_token_callbacks() -> None:
+    llm = _make_llm()
+
+    async def stream() -> AsyncIterator[Dict[str, Any]]:
+        for chunk in _chunks():
+            yield chunk
+
+    model = mock.MagicMock()
+    model.generate = mock.AsyncMock(return_value=stream())
+    llm.async_client = mock.MagicMock()
+    llm.async_client.get_model = mock.AsyncMock(return_value=model)
+    collector = _AsyncTokenCollector()
+
+    chunks = [chunk async for chunk in llm.astream("Hi", config={"callbacks": [collector]})]
+
+    assert chunks == ["Hel", "lo", ""]
+    assert collector.tokens == ["Hel", "lo", ""]
+
+
+def test_call_reads_model_kwargs_changed_after_init() -> None:
+    llm = _make_llm(temperature=0.1)
+    model = mock.MagicMock()
+    model.generate.return_value = _completion("Hello")
+    llm._model = model
+
+    llm.model_kwargs["temperature"] = 0.7
+    llm.invoke("Hi", generate_config={"max_tokens": 8})
+
+    generate_config = model.generate.call_args.kwargs["generate_config"]
+    assert generate_config["temperature"] == 0.7
+    assert generate_config["max_tokens"] == 8
+    assert "max_tokens" not in llm.model_kwargs
+
+
+def test_call_downgrades_stream_without_token_callbacks() -> None:
+    llm = _make_llm(stream=True)
+    model = mock.MagicMock()
+    model.generate.return_value = _completion("Hello")
+    llm._model = model
+
+    assert llm.invoke("Hi") == "Hello"
+    assert model.generate.call_args.kwargs["generate_config"]["stream"] is False
+
+
+def test_call_streams_to_token_callbacks() -> None:
+    llm = _make_llm(stream=True)
+    model = mock.MagicMock()
+    model.generate.return_value = iter(_chunks())
+    llm._model = model
+    collector = _TokenCollector()
+
+    assert llm.invoke("Hi", config={"callbacks": [collector]}) == "Hello"
+    assert model.generate.call_args.kwargs["generate_config"]["stream"] is True
+    assert collector.tokens == ["Hel", "lo", ""]
+
+
+def test_stream_keeps_finish_reason_of_text_less_chunks() -> None:
+    llm = _make_llm()
+    model = mock.MagicMock()
+    model.generate.return_value = iter(_chunks())
+    llm._model = model
+
+    assert list(llm.stream("Hi")) == ["Hel", "lo", ""]
+    assert _parse_chunk({"choices": [{"finish_reason": "stop"}]}) == ("", None, "stop")
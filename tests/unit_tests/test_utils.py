@@ -0,0 +1,148 @@
+import asyncio
+from typing import Any
+from unittest import mock
+
+import aiohttp
+import pytest
+
+from langchain_xinference import _utils
+from langchain_xinference._utils import AsyncModelHandles
+
+
+@pytest.fixture(autouse=True)
+def _isolated_pools(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(_utils, "_ASYNC_SESSIONS", {})
+    monkeypatch.setattr(_utils, "_ASYNC_CLIENTS", {})
+    monkeypatch.setattr(_utils, "_CLIENTS", {})
+
+
+def _fake_client_classes(monkeypatch: pytest.MonkeyPatch) -> mock.MagicMock:
+    monkeypatch.setitem(_utils._CLUSTER_AUTH, "http://xinference", False)
+
+    def async_client(base_url: str, api_key: Any, cluster_authed: bool) -> Any:
+        return mock.MagicMock(session=aiohttp.ClientSession(), close=mock.AsyncMock())
+
+    client = mock.MagicMock(side_effect=lambda base_url, api_key: mock.MagicMock())
+    monkeypatch.setattr(_utils, "client_classes", lambda: (client, async_client))
+    return client
+
+
+def test_release_session_closes_session_of_closed_loop() -> None:
+    async def open_session() -> aiohttp.ClientSession:
+        return aiohttp.ClientSession()
+
+    session = asyncio.run(open_session())
+    connector = session.connector
+
+    _utils._release_session(session)
+
+    assert session.closed
+    assert connector is not None and connector.closed
+
+
+def test_async_sessions_of_closed_loops_are_released() -> None:
+    async def get_session() -> aiohttp.ClientSession:
+        return _utils.get_async_session()
+
+    first = asyncio.run(get_session())
+    second = asyncio.run(get_session())
+
+    assert second is not first
+    assert first.closed
+    assert list(_utils._ASYNC_SESSIONS.values()) == [second]
+    _utils._release_session(second)
+
+
+def test_async_model_handles_of_closed_loops_are_released() -> None:
+    handles = AsyncModelHandles()
+
+    async def resolve() -> Any:
+        return mock.MagicMock(session=aiohttp.ClientSession())
+
+    first = asyncio.run(handles.get(resolve))
+    first_session = first.session
+    second = asyncio.run(handles.get(resolve))
+
+    assert second is not first
+    assert first.session is None and first_session.closed
+    assert list(handles._handles.values()) == [second]
+    assert len(handles._locks) == 1
+    _utils._release_session_owner(second)
+
+
+def test_clients_are_shared_per_server_and_api_key(monkeypatch: pytest.MonkeyPatch) -> None:
+    client = _fake_client_classes(monkeypatch)
+
+    first = _utils.get_client("http://xinference")
+
+    assert _utils.get_client("http://xinference") is first
+    assert _utils.get_client("http://xinference", "key") is not first
+    assert client.call_count == 2
+
+
+def test_async_clients_are_shared_per_loop_and_released_with_it(monkeypatch: pytest.MonkeyPatch) -> None:
+    _fake_client_classes(monkeypatch)
+
+    async def get_clients() -> Any:
+        client = await _utils.aget_async_client("http://xinference")
+        assert await _utils.aget_async_client("http://xinference") is client
+        return client, client.session
+
+    first, first_session = asyncio.run(get_clients())
+    second, _ = asyncio.run(get_clients())
+
+    assert second is not first
+    assert first.session is None and first_session.closed
+    assert [list(clients.values()) for clients in _utils._ASYNC_CLIENTS.values()] == [[second]]
+    _utils._release_session_owner(second)
+
+
+async def test_aclose_async_sessions_closes_the_shared_session() -> None:
+    session = _utils.get_async_session()
+
+    await _utils.aclose_async_sessions()
+
+    assert session.closed
+    assert _utils.get_async_session() is not session
+    await _utils.aclose_async_sessions()
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_json_round_trip(monkeypatch: pytest.MonkeyPatch, use_orjson: bool) -> None:
+    if use_orjson:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(_utils, "orjson", None)
+    document = {"input": ["a", "é"], "data": [{"index": 0, "embedding": [0.5, -1.0]}]}
+
+    encoded = _utils.json_dumps(document)
+
+    assert isinstance(encoded, bytes)
+    assert _utils.json_loads(encoded) == document
+    assert _utils.json_loads(encoded.decode("utf-8")) == document
+
+
+def test_cluster_auth_is_probed_once_per_server(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(_utils, "_CLUSTER_AUTH", {})
+    probe = mock.MagicMock(return_value=True)
+    monkeypatch.setattr(_utils, "_probe_cluster_auth", probe)
+
+    assert _utils.cluster_auth_enabled(_utils.SESSION, "http://a")
+    assert _utils.cluster_auth_enabled(_utils.SESSION, "http://a")
+    assert _utils.cluster_auth_enabled(_utils.SESSION, "http://b")
+
+    assert [c.args[1] for c in probe.call_args_list] == ["http://a", "http://b"]
+
+
+async def test_async_cluster_auth_reuses_the_sync_probe(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(_utils, "_CLUSTER_AUTH", {})
+    monkeypatch.setattr(_utils, "_probe_cluster_auth", mock.MagicMock(return_value=False))
+    aprobe = mock.AsyncMock(return_value=True)
+    monkeypatch.setattr(_utils, "_aprobe_cluster_auth", aprobe)
+
+    assert not _utils.cluster_auth_enabled(_utils.SESSION, "http://a")
+    assert not await _utils.acluster_auth_enabled("http://a")
+    assert await _utils.acluster_auth_enabled("http://b")
+    assert await _utils.acluster_auth_enabled("http://b")
+
+    aprobe.assert_awaited_once_with("http://b")